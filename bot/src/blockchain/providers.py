@@ -50,16 +50,18 @@ class NetworkProvider:
 
 
 _async_eth_module = {"eth": (web3.eth.AsyncEth,), "net": (web3.net.AsyncNet,)}
-L1_PROVIDER = web3.Web3(
-    web3.Web3.AsyncHTTPProvider(src.envs.L1_RPC_URL),
-    modules=_async_eth_module,
-    middlewares=[],
-)
-ARBITRUM_PROVIDER = web3.Web3(
-    web3.Web3.AsyncHTTPProvider(src.envs.ARBITRUM_RPC_URL),
-    modules=_async_eth_module,
-    middlewares=[],
-)
+
+
+def connect_provider(rpc_url: str) -> web3.Web3:
+    return web3.Web3(
+        web3.Web3.AsyncHTTPProvider(rpc_url),
+        modules=_async_eth_module,
+        middlewares=[],
+    )
+
+
+L1_PROVIDER = connect_provider(src.envs.L1_RPC_URL)
+ARBITRUM_PROVIDER = connect_provider(src.envs.ARBITRUM_RPC_URL)
 
 # black: ignore
 L1_ASSETS = [
@@ -0,0 +1,204 @@
+"""
+Historical liquidity value and uncollected fees of positions.
+
+Every block is evaluated with archive `eth_call`s pinned to it,
+so the provider has to be an archive node. A local stand-in works too,
+i.e. `anvil --fork-url <archive RPC URL>` connected with
+`src.blockchain.providers.connect_provider("http://127.0.0.1:8545")`
+"""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import json
+import os
+import pathlib
+import typing
+
+import loguru
+import web3.exceptions
+
+from src.blockchain.providers import NetworkProvider
+from src.blockchain.uniswap.pool_reads import MissingContractError, PoolReads
+from src.blockchain.uniswap.position import Position
+
+
+@dataclasses.dataclass
+class BackfillRecord:
+    network_label: str
+    nft_token_id: int
+    block: int
+    liquidity0_amount: float
+    liquidity1_amount: float
+    liquidity_in_usd: float
+    fee0_amount: float
+    fee1_amount: float
+    fee_in_usd: float
+    # False marks blocks with nothing to evaluate: the position is not minted
+    # yet or already burned, or a contract it depends on is not deployed yet
+    exists: bool = True
+
+
+@dataclasses.dataclass
+class BackfillStore:
+    """
+    JSON file with already evaluated records,
+    so following runs evaluate only missing blocks
+    """
+
+    path: pathlib.Path
+    records: dict[tuple[str, int, int], BackfillRecord] = dataclasses.field(
+        default_factory=dict
+    )
+
+    @classmethod
+    def load(cls, path: typing.Union[str, pathlib.Path]) -> BackfillStore:
+        path = pathlib.Path(path)
+        store = cls(path=path)
+        if path.exists():
+            for record in json.loads(path.read_text(encoding="UTF-8")):
+                store.add(BackfillRecord(**record))
+        return store
+
+    def save(self) -> None:
+        records = [dataclasses.asdict(record) for record in self.records.values()]
+        # Replace the store at once so an interrupted write can't corrupt it
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps(records), encoding="UTF-8")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(
+        network_label: str, nft_token_id: int, block: int
+    ) -> tuple[str, int, int]:
+        return network_label, nft_token_id, block
+
+    def has(self, network_label: str, nft_token_id: int, block: int) -> bool:
+        return self._key(network_label, nft_token_id, block) in self.records
+
+    def add(self, record: BackfillRecord) -> None:
+        key = self._key(record.network_label, record.nft_token_id, record.block)
+        self.records[key] = record
+
+    def history(self, network_label: str, nft_token_id: int) -> list[BackfillRecord]:
+        return sorted(
+            (
+                record
+                for record in self.records.values()
+                if record.network_label == network_label
+                and record.nft_token_id == nft_token_id
+                and record.exists
+            ),
+            key=lambda record: record.block,
+        )
+
+
+def _missing_record(
+    provider: NetworkProvider, reads: PoolReads, nft_token_id: int
+) -> BackfillRecord:
+    return BackfillRecord(
+        network_label=provider.network_label,
+        nft_token_id=nft_token_id,
+        block=reads.block_identifier,
+        liquidity0_amount=0.0,
+        liquidity1_amount=0.0,
+        liquidity_in_usd=0.0,
+        fee0_amount=0.0,
+        fee1_amount=0.0,
+        fee_in_usd=0.0,
+        exists=False,
+    )
+
+
+async def _evaluate_position(
+    provider: NetworkProvider, reads: PoolReads, nft_token_id: int
+) -> BackfillRecord:
+    try:
+        position = await Position.fetch(provider, nft_token_id, reads.block_identifier)
+    except (
+        web3.exceptions.ContractLogicError,
+        web3.exceptions.BadFunctionCallOutput,
+    ):
+        # Not minted yet, already burned or the manager is not deployed yet
+        return _missing_record(provider, reads, nft_token_id)
+
+    try:
+        fees, own_liquidity = await asyncio.gather(
+            position.calc_fees(provider, reads),
+            position.calc_own_liquidity(provider, reads),
+        )
+    except MissingContractError:
+        # A pool the position is valued with is not deployed yet
+        return _missing_record(provider, reads, nft_token_id)
+    return BackfillRecord(
+        network_label=provider.network_label,
+        nft_token_id=nft_token_id,
+        block=reads.block_identifier,
+        liquidity0_amount=own_liquidity.token0,
+        liquidity1_amount=own_liquidity.token1,
+        liquidity_in_usd=own_liquidity.token0_usd + own_liquidity.token1_usd,
+        fee0_amount=fees.token0,
+        fee1_amount=fees.token1,
+        fee_in_usd=fees.token0_usd + fees.token1_usd,
+    )
+
+
+async def backfill(
+    provider: NetworkProvider,
+    nft_token_ids: typing.Iterable[int],
+    blocks: typing.Iterable[int],
+    store: BackfillStore,
+    concurrency: int = 8,
+) -> list[BackfillRecord]:
+    """
+    Evaluates positions at every block (i.e. `range(start, stop, step)`)
+    that is not in the store yet. At most `concurrency` blocks are
+    evaluated at the same time and all positions at the same block
+    share pool and tick reads. A failed block is logged and left out
+    of the store, so the next run retries it. The store is saved once
+    every block is finished, failed or cancelled. Returns new records
+    of existing positions
+    """
+    nft_token_ids = list(nft_token_ids)
+    semaphore = asyncio.Semaphore(concurrency)
+    new_records = []
+
+    async def evaluate_block(block: int) -> None:
+        missing = [
+            nft_token_id
+            for nft_token_id in nft_token_ids
+            if not store.has(provider.network_label, nft_token_id, block)
+        ]
+        if not missing:
+            return
+        async with semaphore:
+            reads = PoolReads(provider, block)
+            records = await asyncio.gather(
+                *(
+                    _evaluate_position(provider, reads, nft_token_id)
+                    for nft_token_id in missing
+                )
+            )
+        for record in records:
+            store.add(record)
+            if record.exists:
+                new_records.append(record)
+        loguru.logger.debug(f"Backfilled {provider.network} at block {block}")
+
+    blocks = list(blocks)
+    tasks = [asyncio.ensure_future(evaluate_block(block)) for block in blocks]
+    try:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        store.save()
+
+    for block, result in zip(blocks, results):
+        if isinstance(result, Exception):
+            loguru.logger.opt(exception=result).warning(
+                f"Failed to backfill {provider.network} at block {block}"
+            )
+
+    return sorted(new_records, key=lambda record: (record.nft_token_id, record.block))
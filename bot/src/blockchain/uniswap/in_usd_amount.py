@@ -6,15 +6,19 @@ import typing
 import loguru
 import web3
 
-from src.blockchain.contracts import UniswapV3FactoryContract, UniswapV3PoolContract
 from src.blockchain.erc20_token import ERC20Token
+from src.blockchain.uniswap.pool_reads import PoolReads
 
 if typing.TYPE_CHECKING:
     from src.blockchain.providers import NetworkProvider
 
 
 async def calc_amount_in_usd(
-    provider: NetworkProvider, token_address: str, amount: float, fee: int
+    provider: NetworkProvider,
+    token_address: str,
+    amount: float,
+    fee: int,
+    reads: typing.Optional[PoolReads] = None,
 ) -> float:
     # Fetch tokens' info
     erc20_token0 = await ERC20Token.fetch(provider, token_address)
@@ -25,13 +29,10 @@ async def calc_amount_in_usd(
     )
 
     # Fetch liquidity pool for calculating
-    factory = UniswapV3FactoryContract.static_connect(provider.provider)
-    pool_address = await factory.contract.functions.getPool(
-        token_address, provider.usd_stablecoin_address, fee
-    ).call()
-    pool = UniswapV3PoolContract.connect(provider.provider, pool_address)
+    reads = reads or PoolReads(provider)
+    pool = await reads.get_pool(token_address, provider.usd_stablecoin_address, fee)
 
-    sqrt_price_x96 = (await pool.contract.functions.slot0().call())[0]
+    sqrt_price_x96 = (await reads.slot0(pool))[0]
     price_x96 = sqrt_price_x96**2
     if math.log(price_x96, 2) > 192:
         price_x96 = 2**192 / (price_x96 / 2**192)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import typing
+
+import web3.constants
+import web3.contract
+import web3.exceptions
+import web3.types
+
+from src.blockchain.contracts import UniswapV3FactoryContract, UniswapV3PoolContract
+
+if typing.TYPE_CHECKING:
+    from src.blockchain.providers import NetworkProvider
+
+# Pool addresses never change once a pool is created,
+# so they are shared between all blocks. Missing pools are not cached
+# because they can be created later
+pool_addresses_cache = {}
+
+
+class MissingContractError(Exception):
+    """
+    The pool doesn't exist or has no code at the block of the read
+    """
+
+
+@dataclasses.dataclass
+class PoolReads:
+    """
+    Pool state reads pinned to a single block. A block tag like "latest"
+    is resolved to a block number by the first read and all following
+    reads use that number. The only exception is `getPool`, which is
+    always asked at the latest block since a pool address never changes;
+    a pool deployed after the pinned block raises `MissingContractError`
+    on the first pinned read. Every read is done once per instance,
+    so positions sharing the same pools and ticks share the calls too
+    """
+
+    provider: NetworkProvider
+    block_identifier: web3.types.BlockIdentifier = "latest"
+    _calls: dict[tuple, asyncio.Future] = dataclasses.field(
+        default_factory=dict, repr=False
+    )
+
+    def _once(self, key: tuple, call: typing.Callable[[], typing.Awaitable]):
+        if key not in self._calls:
+            self._calls[key] = asyncio.ensure_future(call())
+        return self._calls[key]
+
+    async def block_number(self) -> int:
+        if isinstance(self.block_identifier, int):
+            return self.block_identifier
+        block = await self._once(
+            ("block",),
+            lambda: self.provider.provider.eth.get_block(self.block_identifier),
+        )
+        return block["number"]
+
+    async def _call(self, function: web3.contract.ContractFunction) -> typing.Any:
+        block_number = await self.block_number()
+        try:
+            return await function.call(block_identifier=block_number)
+        except web3.exceptions.BadFunctionCallOutput as error:
+            # Empty output means there is no code at the address yet
+            raise MissingContractError(
+                f"{function.address} has no code at block {block_number}"
+            ) from error
+
+    async def get_pool(
+        self, token0: str, token1: str, fee: int
+    ) -> UniswapV3PoolContract:
+        cache_key = (self.provider.network_label, *sorted((token0, token1)), fee)
+        pool_address = pool_addresses_cache.get(cache_key)
+        if pool_address is None:
+            factory = UniswapV3FactoryContract.static_connect(self.provider.provider)
+            pool_address = await self._once(
+                ("getPool", *cache_key),
+                factory.contract.functions.getPool(token0, token1, fee).call,
+            )
+            if pool_address == web3.constants.ADDRESS_ZERO:
+                raise MissingContractError(f"No pool for {token0}/{token1} ({fee})")
+            pool_addresses_cache[cache_key] = pool_address
+        return UniswapV3PoolContract.connect(self.provider.provider, pool_address)
+
+    async def slot0(self, pool: UniswapV3PoolContract) -> list:
+        return await self._once(
+            ("slot0", pool.address),
+            lambda: self._call(pool.contract.functions.slot0()),
+        )
+
+    async def fee_growth_global(self, pool: UniswapV3PoolContract) -> list[int]:
+        return await self._once(
+            ("feeGrowthGlobal", pool.address),
+            lambda: asyncio.gather(
+                self._call(pool.contract.functions.feeGrowthGlobal0X128()),
+                self._call(pool.contract.functions.feeGrowthGlobal1X128()),
+            ),
+        )
+
+    async def ticks(self, pool: UniswapV3PoolContract, tick: int) -> list:
+        return await self._once(
+            ("ticks", pool.address, tick),
+            lambda: self._call(pool.contract.functions.ticks(tick)),
+        )
@@ -4,18 +4,17 @@ import asyncio
 import dataclasses
 import itertools
 import math
+import typing
 
 import web3
 import web3.exceptions
+import web3.types
 
-from src.blockchain.contracts import (
-    NonfungiblePositionManagerContract,
-    UniswapV3FactoryContract,
-    UniswapV3PoolContract,
-)
+from src.blockchain.contracts import NonfungiblePositionManagerContract
 from src.blockchain.erc20_token import ERC20Token
 from src.blockchain.providers import NetworkProvider
 from src.blockchain.uniswap.in_usd_amount import calc_amount_in_usd
+from src.blockchain.uniswap.pool_reads import PoolReads
 
 
 @dataclasses.dataclass
@@ -34,18 +33,17 @@ class Position:
     token_owed_1: int
     self_nft_token: int
 
-    async def calc_prices(self, provider: NetworkProvider) -> PositionPrices:
+    async def calc_prices(
+        self, provider: NetworkProvider, reads: typing.Optional[PoolReads] = None
+    ) -> PositionPrices:
         erc20_token0 = await ERC20Token.fetch(provider, self.token0)
         erc20_token1 = await ERC20Token.fetch(provider, self.token1)
 
         # Fetch liquidity pool for calculating
-        factory = UniswapV3FactoryContract.static_connect(provider.provider)
-        pool_address = await factory.contract.functions.getPool(
-            self.token0, self.token1, self.fee
-        ).call()
-        pool = UniswapV3PoolContract.connect(provider.provider, pool_address)
+        reads = reads or PoolReads(provider)
+        pool = await reads.get_pool(self.token0, self.token1, self.fee)
 
-        sqrt_price_x96 = (await pool.contract.functions.slot0().call())[0]
+        sqrt_price_x96 = (await reads.slot0(pool))[0]
         price0 = (
             sqrt_price_x96**2
             * (10**erc20_token0.decimals / 10**erc20_token1.decimals)
@@ -59,29 +57,29 @@ class Position:
         erc20_token1 = await ERC20Token.fetch(provider, self.token1)
         return PositionTokens(token0=erc20_token0, token1=erc20_token1)
 
-    async def calc_own_liquidity(self, provider: NetworkProvider) -> PositionLiquidity:
+    async def calc_own_liquidity(
+        self, provider: NetworkProvider, reads: typing.Optional[PoolReads] = None
+    ) -> PositionLiquidity:
         # Fetch tokens' info
         erc20_token0 = await ERC20Token.fetch(provider, self.token0)
         erc20_token1 = await ERC20Token.fetch(provider, self.token1)
 
         # Fetch liquidity pool for calculating
-        factory = UniswapV3FactoryContract.static_connect(provider.provider)
-        pool_address = await factory.contract.functions.getPool(
-            self.token0, self.token1, self.fee
-        ).call()
-        pool = UniswapV3PoolContract.connect(provider.provider, pool_address)
+        reads = reads or PoolReads(provider)
+        pool = await reads.get_pool(self.token0, self.token1, self.fee)
 
-        current_tick = (await pool.contract.functions.slot0().call())[1]
+        current_tick = (await reads.slot0(pool))[1]
         pa = math.sqrt(1.0001**self.tick_lower)
         pb = math.sqrt(1.0001**self.tick_upper)
-        p = math.sqrt(1.0001**current_tick)
+        # Out of range the position is entirely in one token
+        p = min(max(math.sqrt(1.0001**current_tick), pa), pb)
         token0 = self.liquidity * (pb - p) / (p * pb)
         token1 = self.liquidity * (p - pa)
         token0 = token0 / (10**erc20_token0.decimals)
         token1 = token1 / (10**erc20_token1.decimals)
         token0_usd, token1_usd = await asyncio.gather(
-            calc_amount_in_usd(provider, self.token0, token0, self.fee),
-            calc_amount_in_usd(provider, self.token1, token1, self.fee),
+            calc_amount_in_usd(provider, self.token0, token0, self.fee, reads),
+            calc_amount_in_usd(provider, self.token1, token1, self.fee, reads),
         )
         return PositionLiquidity(
             token0=token0,
@@ -90,102 +88,125 @@ class Position:
             token1_usd=token1_usd,
         )
 
-    async def calc_fees(self, provider: NetworkProvider) -> PositionFees:
+    async def calc_fees(
+        self, provider: NetworkProvider, reads: typing.Optional[PoolReads] = None
+    ) -> PositionFees:
         # Fetch tokens' info
         erc20_token0 = await ERC20Token.fetch(provider, self.token0)
         erc20_token1 = await ERC20Token.fetch(provider, self.token1)
 
         # Fetch liquidity pool for calculating
-        factory = UniswapV3FactoryContract.static_connect(provider.provider)
-        pool_address = await factory.contract.functions.getPool(
-            self.token0, self.token1, self.fee
-        ).call()
-        pool = UniswapV3PoolContract.connect(provider.provider, pool_address)
+        reads = reads or PoolReads(provider)
+        pool = await reads.get_pool(self.token0, self.token1, self.fee)
 
         (
-            fee_growth_global_0_x128,
-            fee_growth_global_1_x128,
+            (fee_growth_global_0_x128, fee_growth_global_1_x128),
             tick_lower_data,
             tick_upper_data,
+            slot0,
         ) = await asyncio.gather(
-            pool.contract.functions.feeGrowthGlobal0X128().call(),
-            pool.contract.functions.feeGrowthGlobal1X128().call(),
-            pool.contract.functions.ticks(self.tick_lower).call(),
-            pool.contract.functions.ticks(self.tick_upper).call(),
+            reads.fee_growth_global(pool),
+            reads.ticks(pool, self.tick_lower),
+            reads.ticks(pool, self.tick_upper),
+            reads.slot0(pool),
         )
-        fee_growth_outside_0_x128_lower = tick_lower_data[2]
-        fee_growth_outside_1_x128_lower = tick_lower_data[3]
-        fee_growth_outside_0_x128_upper = tick_upper_data[2]
-        fee_growth_outside_1_x128_upper = tick_upper_data[3]
+        current_tick = slot0[1]
 
-        if (
-            fee_growth_global_0_x128
-            - fee_growth_outside_0_x128_lower
-            - fee_growth_outside_0_x128_upper
-            - self.fee_growth_inside_0_last_x128
-            < 0
-        ):
-            token0_fee = (
-                (
-                    (
-                        fee_growth_global_0_x128
-                        + 2**256
-                        - fee_growth_outside_0_x128_lower
-                        - fee_growth_outside_0_x128_upper
-                        - self.fee_growth_inside_0_last_x128
-                    )
-                    / (2**128)
-                )
-                * self.liquidity
-                / (1 * 10**erc20_token0.decimals)
-            )
-            token1_fee = (
-                (
-                    (
-                        fee_growth_global_1_x128
-                        + 2**256
-                        - fee_growth_outside_1_x128_lower
-                        - fee_growth_outside_1_x128_upper
-                        - self.fee_growth_inside_1_last_x128
-                    )
-                    / (2**128)
-                )
-                * self.liquidity
-                / (1 * 10**erc20_token1.decimals)
-            )
-        else:
-            token0_fee = (
-                (
-                    (
-                        fee_growth_global_0_x128
-                        - fee_growth_outside_0_x128_lower
-                        - fee_growth_outside_0_x128_upper
-                        - self.fee_growth_inside_0_last_x128
-                    )
-                    / (2**128)
-                )
-                * self.liquidity
-                / (1 * 10**erc20_token0.decimals)
+        token0_fee = (
+            self._uncollected_fee(
+                current_tick,
+                fee_growth_global_0_x128,
+                fee_growth_outside_lower_x128=tick_lower_data[2],
+                fee_growth_outside_upper_x128=tick_upper_data[2],
+                fee_growth_inside_last_x128=self.fee_growth_inside_0_last_x128,
+                token_owed=self.token_owed_0,
             )
-            token1_fee = (
-                (
-                    (
-                        fee_growth_global_1_x128
-                        - fee_growth_outside_1_x128_lower
-                        - fee_growth_outside_1_x128_upper
-                        - self.fee_growth_inside_1_last_x128
-                    )
-                    / (2**128)
-                )
-                * self.liquidity
-                / (1 * 10**erc20_token1.decimals)
+            / 10**erc20_token0.decimals
+        )
+        token1_fee = (
+            self._uncollected_fee(
+                current_tick,
+                fee_growth_global_1_x128,
+                fee_growth_outside_lower_x128=tick_lower_data[3],
+                fee_growth_outside_upper_x128=tick_upper_data[3],
+                fee_growth_inside_last_x128=self.fee_growth_inside_1_last_x128,
+                token_owed=self.token_owed_1,
             )
+            / 10**erc20_token1.decimals
+        )
 
         return PositionFees(
             token0=token0_fee,
             token1=token1_fee,
-            token0_usd=await calc_amount_in_usd(provider, self.token0, token0_fee, self.fee),
-            token1_usd=await calc_amount_in_usd(provider, self.token1, token1_fee, self.fee),
+            token0_usd=await calc_amount_in_usd(
+                provider, self.token0, token0_fee, self.fee, reads
+            ),
+            token1_usd=await calc_amount_in_usd(
+                provider, self.token1, token1_fee, self.fee, reads
+            ),
+        )
+
+    def _uncollected_fee(
+        self,
+        current_tick: int,
+        fee_growth_global_x128: int,
+        fee_growth_outside_lower_x128: int,
+        fee_growth_outside_upper_x128: int,
+        fee_growth_inside_last_x128: int,
+        token_owed: int,
+    ) -> float:
+        # Fee growth outside of a tick is relative to the current tick,
+        # the same way the pool computes it (all math is modulo 2**256)
+        if current_tick >= self.tick_lower:
+            fee_growth_below_x128 = fee_growth_outside_lower_x128
+        else:
+            fee_growth_below_x128 = (
+                fee_growth_global_x128 - fee_growth_outside_lower_x128
+            )
+        if current_tick < self.tick_upper:
+            fee_growth_above_x128 = fee_growth_outside_upper_x128
+        else:
+            fee_growth_above_x128 = (
+                fee_growth_global_x128 - fee_growth_outside_upper_x128
+            )
+        fee_growth_inside_x128 = (
+            fee_growth_global_x128 - fee_growth_below_x128 - fee_growth_above_x128
+        ) % 2**256
+        fee_x128 = (
+            (fee_growth_inside_x128 - fee_growth_inside_last_x128) % 2**256
+        ) * self.liquidity
+        # Fees credited by decreaseLiquidity but not collected yet
+        return fee_x128 / 2**128 + token_owed
+
+    @classmethod
+    async def fetch(
+        cls,
+        provider: NetworkProvider,
+        nft_token: int,
+        block_identifier: web3.types.BlockIdentifier = "latest",
+    ) -> Position:
+        position_manager = NonfungiblePositionManagerContract.static_connect(provider.provider)
+        position = await position_manager.contract.functions.positions(
+            nft_token
+        ).call(block_identifier=block_identifier)
+        return cls._from_raw(position, nft_token)
+
+    @classmethod
+    def _from_raw(cls, position: list, nft_token: int) -> Position:
+        return Position(
+            nonce=position[0],
+            operator=position[1],
+            token0=position[2],
+            token1=position[3],
+            fee=position[4],
+            tick_lower=position[5],
+            tick_upper=position[6],
+            liquidity=position[7],
+            fee_growth_inside_0_last_x128=position[8],
+            fee_growth_inside_1_last_x128=position[9],
+            token_owed_0=position[10],
+            token_owed_1=position[11],
+            self_nft_token=nft_token,
         )
 
     @classmethod
@@ -206,23 +227,7 @@ class Position:
                 position = await position_manager.contract.functions.positions(
                     nft_token
                 ).call()
-                positions.append(
-                    Position(
-                        nonce=position[0],
-                        operator=position[1],
-                        token0=position[2],
-                        token1=position[3],
-                        fee=position[4],
-                        tick_lower=position[5],
-                        tick_upper=position[6],
-                        liquidity=position[7],
-                        fee_growth_inside_0_last_x128=position[8],
-                        fee_growth_inside_1_last_x128=position[9],
-                        token_owed_0=position[10],
-                        token_owed_1=position[11],
-                        self_nft_token=nft_token,
-                    )
-                )
+                positions.append(cls._from_raw(position, nft_token))
             except web3.exceptions.ContractLogicError:
                 break
         return positions
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+
+import loguru
+
+if typing.TYPE_CHECKING:
+    import vkquick as vq
+
+
+# VK rejects messages longer than this
+MESSAGE_LENGTH_LIMIT = 4096
+
+# Pages of the last sent report by user id
+snapshots: dict[str, list[str]] = {}
+
+
+@dataclasses.dataclass
+class PositionReport:
+    nft_token_id: int
+    network: str
+    token0_symbol: str
+    token1_symbol: str
+    price0: float
+    price1: float
+    liquidity0_amount: float
+    liquidity1_amount: float
+    liquidity_in_usd: float
+    fee0_amount: float
+    fee1_amount: float
+    fee_in_usd: float
+    total_usd: float
+
+    _template = (
+        "[ {network} ({nft_token_id}) ] "
+        "\n-> Pair: {token0_symbol}/{token1_symbol}"
+        "\n-> Price: {price0:.7f}/{price1:.7f}"
+        "\n-> Liquidity: {liquidity0_amount:.5f}/{liquidity1_amount:.5f}"
+        "\n-> Fees: {fee0_amount:.5f}/{fee1_amount:.5f}"
+        "\n-> $ Liquidity: ${liquidity_in_usd:.2f}"
+        "\n-> $ Fees: ${fee_in_usd:.2f}"
+        "\n-> $ Total: ${total_usd:.2f}"
+        "\n"
+    )
+
+    def render(self) -> str:
+        return self._template.format_map(vars(self))
+
+
+@dataclasses.dataclass
+class TrackingReport:
+    positions: list[PositionReport]
+    total_fee_in_usd: float
+    total_locked_in_usd: float
+    total_awaited_in_usd: float
+    total_balance_in_usd: float
+
+    _template = (
+        "[ TOTAL ]"
+        "\n--> $ Fees: ${total_fee_in_usd:.2f}"
+        "\n--> $ Locked: ${total_locked_in_usd:.2f}"
+        "\n--> $ Awaited: ${total_awaited_in_usd:.2f}"
+        "\n--> $ Balance: ${total_balance_in_usd:.2f}"
+        "\n--> $ Total: ${total_usd:.2f}"
+    )
+
+    def _render_blocks(self) -> list[str]:
+        blocks = [pos.render() for pos in self.positions]
+        blocks.append(
+            self._template.format(
+                **vars(self),
+                total_usd=self.total_awaited_in_usd + self.total_balance_in_usd,
+            )
+        )
+        return blocks
+
+    def render(self) -> str:
+        return "\n\n".join(self._render_blocks())
+
+    def render_pages(self, limit: int = MESSAGE_LENGTH_LIMIT) -> list[str]:
+        """
+        Splits the report between positions so every page fits into `limit`
+        """
+        pages = []
+        page = []
+        page_length = 0
+        for block in self._render_blocks():
+            if page and page_length + 2 + len(block) > limit:
+                pages.append("\n\n".join(page))
+                page = []
+                page_length = 0
+            page_length += len(block) + 2 * bool(page)
+            page.append(block)
+        pages.append("\n\n".join(page))
+        return pages
+
+
+async def send_report(
+    ctx: vq.NewMessage, report: TrackingReport, keyboard: vq.Keyboard
+) -> None:
+    user_id = str(ctx.msg.from_id)
+    # Rendered values are rounded to display precision,
+    # so equal pages mean there is nothing new to show.
+    # An unchanged report costs a single short reply and no edit
+    pages = report.render_pages()
+    if snapshots.get(user_id) == pages:
+        loguru.logger.debug(f"Report of {user_id} is unchanged, skipping")
+        await ctx.reply("No changes since the last report", keyboard=keyboard)
+        return
+
+    for page in pages[:-1]:
+        await ctx.reply(page)
+    await ctx.reply(pages[-1], keyboard=keyboard)
+    # Only after every page is delivered, so a failed send is retried
+    snapshots[user_id] = pages
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+# `src.envs` reads these on import
+os.environ.setdefault("VK_BOT_GROUP_TOKEN", "test")
+os.environ.setdefault("L1_RPC_URL", "http://127.0.0.1:8545")
+os.environ.setdefault("ARBITRUM_RPC_URL", "http://127.0.0.1:8545")
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    import src.blockchain.erc20_token
+    import src.blockchain.uniswap.pool_reads
+    import src.reports
+
+    src.blockchain.erc20_token.cache.clear()
+    src.blockchain.uniswap.pool_reads.pool_addresses_cache.clear()
+    src.reports.snapshots.clear()
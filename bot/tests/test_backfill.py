@@ -0,0 +1,283 @@
+import asyncio
+import collections
+import json
+
+import pytest
+import web3.constants
+import web3.exceptions
+
+from src.blockchain.contracts import (
+    NonfungiblePositionManagerContract,
+    UniswapV3FactoryContract,
+)
+from src.blockchain.providers import NetworkProvider
+from src.blockchain.uniswap.backfill import BackfillRecord, BackfillStore, backfill
+from src.blockchain.uniswap.pool_reads import PoolReads, pool_addresses_cache
+from src.blockchain.uniswap.position import Position
+
+USDC = "0x00000000000000000000000000000000000000A1"
+WETH = "0x00000000000000000000000000000000000000A2"
+POOL = "0x00000000000000000000000000000000000000B1"
+MINT_BLOCK = 100
+LIQUIDITY = 10**18
+
+
+class FakeArchive:
+    """
+    In-process stand-in for an archive node: answers contract calls
+    from state computed by block number and counts every call
+    """
+
+    def __init__(
+        self,
+        latest: int = 200,
+        failing_block: int = None,
+        tick: int = 0,
+        pool_address: str = POOL,
+        pool_deploy_block: int = 0,
+        manager_deploy_block: int = 0,
+    ):
+        self.latest = latest
+        self.failing_block = failing_block
+        self.tick = tick
+        self.pool_address = pool_address
+        self.pool_deploy_block = pool_deploy_block
+        self.manager_deploy_block = manager_deploy_block
+        self.calls = collections.Counter()
+
+    @property
+    def eth(self):
+        return self
+
+    def contract(self, address, abi):
+        return FakeContract(self, address)
+
+    async def get_block(self, block_identifier):
+        self.calls[("get_block", block_identifier)] += 1
+        return {"number": self.latest}
+
+    def respond(self, address, name, args, block):
+        if address == UniswapV3FactoryContract._get_address():
+            return self.pool_address
+        if address == NonfungiblePositionManagerContract._get_address():
+            if block < self.manager_deploy_block:
+                raise web3.exceptions.BadFunctionCallOutput("No code")
+            if block < MINT_BLOCK:
+                raise web3.exceptions.ContractLogicError("Invalid token ID")
+            return (0, "", USDC, WETH, 3000, -60, 60, LIQUIDITY, 0, 0, 0, 0)
+        if address in (USDC, WETH):
+            return {"symbol": "USDC" if address == USDC else "WETH", "decimals": 18}[
+                name
+            ]
+        if block == self.failing_block:
+            raise asyncio.TimeoutError
+        if address != POOL or block < self.pool_deploy_block:
+            raise web3.exceptions.BadFunctionCallOutput("No code")
+        if name == "slot0":
+            return (2**96, self.tick, 0, 0, 0, 0, True)
+        if name in ("feeGrowthGlobal0X128", "feeGrowthGlobal1X128"):
+            return block * 2**128
+        if name == "ticks":
+            return (0, 0, 0, 0, 0, 0, 0, True)
+        raise NotImplementedError(name)
+
+
+class FakeContract:
+    def __init__(self, archive: FakeArchive, address: str):
+        self.archive = archive
+        self.address = address
+
+    @property
+    def functions(self):
+        return self
+
+    def __getattr__(self, name):
+        return lambda *args: FakeFunction(self.archive, self.address, name, args)
+
+
+class FakeFunction:
+    def __init__(self, archive: FakeArchive, address: str, name: str, args: tuple):
+        self.archive = archive
+        self.address = address
+        self.name = name
+        self.args = args
+
+    async def call(self, block_identifier="latest"):
+        if block_identifier == "latest":
+            block_identifier = self.archive.latest
+        self.archive.calls[(self.address, self.name, self.args, block_identifier)] += 1
+        return self.archive.respond(
+            self.address, self.name, self.args, block_identifier
+        )
+
+
+def make_provider(archive: FakeArchive) -> NetworkProvider:
+    return NetworkProvider(
+        network="Test network",
+        network_label="TEST",
+        provider=archive,
+        assets=[],
+        usd_stablecoin_address=USDC,
+        weth_address=WETH,
+    )
+
+
+def test_store_round_trip(tmp_path):
+    path = tmp_path / "backfill.json"
+    store = BackfillStore.load(path)
+    record = BackfillRecord("TEST", 1, 100, 1.0, 2.0, 3.0, 0.1, 0.2, 0.3)
+    marker = BackfillRecord("TEST", 1, 90, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, exists=False)
+    store.add(record)
+    store.add(marker)
+    store.save()
+
+    loaded = BackfillStore.load(path)
+    assert loaded.records == store.records
+    assert loaded.has("TEST", 1, 90)
+    assert loaded.history("TEST", 1) == [record]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_backfill_is_incremental(tmp_path):
+    archive = FakeArchive()
+    provider = make_provider(archive)
+    store = BackfillStore.load(tmp_path / "backfill.json")
+    blocks = range(80, 130, 10)
+
+    records = asyncio.run(backfill(provider, [1, 2], blocks, store))
+    assert [(record.nft_token_id, record.block) for record in records] == [
+        (nft_token_id, block) for nft_token_id in (1, 2) for block in (100, 110, 120)
+    ]
+    # Fee growth is `block` per unit of liquidity and the price is 1
+    assert records[0].fee0_amount == records[0].fee1_amount == 100
+    assert records[0].fee_in_usd == 200
+    # Positions at the same block share every pool read
+    assert {
+        count for (address, *_), count in archive.calls.items() if address == POOL
+    } == {1}
+
+    calls = sum(archive.calls.values())
+    store = BackfillStore.load(tmp_path / "backfill.json")
+    assert asyncio.run(backfill(provider, [1, 2], blocks, store)) == []
+    assert sum(archive.calls.values()) == calls
+
+
+def test_backfill_keeps_other_blocks_when_one_fails(tmp_path):
+    archive = FakeArchive(failing_block=110)
+    provider = make_provider(archive)
+    path = tmp_path / "backfill.json"
+
+    records = asyncio.run(
+        backfill(provider, [1], [100, 110, 120], BackfillStore.load(path))
+    )
+    assert [record.block for record in records] == [100, 120]
+    assert [record.block for record in BackfillStore.load(path).history("TEST", 1)] == [
+        100,
+        120,
+    ]
+    assert {record["block"] for record in json.loads(path.read_text())} == {100, 120}
+
+
+def test_backfill_stores_missing_contracts(tmp_path):
+    archive = FakeArchive(manager_deploy_block=50, pool_deploy_block=110)
+    provider = make_provider(archive)
+    path = tmp_path / "backfill.json"
+    blocks = [40, 60, 100, 110, 120]
+
+    records = asyncio.run(backfill(provider, [1], blocks, BackfillStore.load(path)))
+    assert [record.block for record in records] == [110, 120]
+    store = BackfillStore.load(path)
+    assert all(store.has("TEST", 1, block) for block in blocks)
+
+    calls = sum(archive.calls.values())
+    assert asyncio.run(backfill(provider, [1], blocks, store)) == []
+    assert sum(archive.calls.values()) == calls
+
+
+def test_backfill_stores_missing_pool(tmp_path):
+    archive = FakeArchive(pool_address=web3.constants.ADDRESS_ZERO)
+    store = BackfillStore.load(tmp_path / "backfill.json")
+
+    assert asyncio.run(backfill(make_provider(archive), [1], [100], store)) == []
+    assert store.has("TEST", 1, 100)
+    assert not pool_addresses_cache
+
+
+def test_pool_reads_resolve_tag_once():
+    archive = FakeArchive(latest=150)
+    reads = PoolReads(make_provider(archive))
+
+    async def read():
+        pool = await reads.get_pool(USDC, WETH, 3000)
+        await asyncio.gather(reads.slot0(pool), reads.slot0(pool))
+        archive.latest = 151
+        await reads.fee_growth_global(pool)
+
+    asyncio.run(read())
+    assert archive.calls[("get_block", "latest")] == 1
+    assert archive.calls[(POOL, "slot0", (), 150)] == 1
+    assert archive.calls[(POOL, "feeGrowthGlobal0X128", (), 150)] == 1
+
+
+@pytest.mark.parametrize(
+    "current_tick, fee_growth_outside_lower, fee_growth_outside_upper, expected_fee",
+    [
+        # In range: 10 - 2 - 5 grown inside
+        (0, 2, 5, 10 - 2 - 5 - 1 + 0.5),
+        # Above the range: 10 - 2 - (10 - 8) grown inside
+        (100, 2, 8, 8 - 2 - 1 + 0.5),
+        # Below the range: 10 - (10 - 7) - 2 grown inside
+        (-100, 7, 2, 7 - 2 - 1 + 0.5),
+    ],
+)
+def test_uncollected_fee(
+    current_tick, fee_growth_outside_lower, fee_growth_outside_upper, expected_fee
+):
+    position = Position(
+        nonce=0,
+        operator="",
+        token0=USDC,
+        token1=WETH,
+        fee=3000,
+        tick_lower=-60,
+        tick_upper=60,
+        liquidity=1,
+        fee_growth_inside_0_last_x128=2**128,
+        fee_growth_inside_1_last_x128=2**128,
+        token_owed_0=0,
+        token_owed_1=0,
+        self_nft_token=1,
+    )
+    fee = position._uncollected_fee(
+        current_tick,
+        fee_growth_global_x128=10 * 2**128,
+        fee_growth_outside_lower_x128=fee_growth_outside_lower * 2**128,
+        fee_growth_outside_upper_x128=fee_growth_outside_upper * 2**128,
+        fee_growth_inside_last_x128=2**128,
+        token_owed=0.5,
+    )
+    assert fee == expected_fee
+
+
+@pytest.mark.parametrize(
+    "current_tick, expected_token0, expected_token1",
+    [
+        # Square root prices of the range are 1.0001**-30 and 1.0001**30
+        (0, 1 - 1.0001**-30, 1 - 1.0001**-30),
+        # Above the range everything is in token1
+        (100, 0, 1.0001**30 - 1.0001**-30),
+        # Below the range everything is in token0
+        (-100, 1.0001**30 - 1.0001**-30, 0),
+    ],
+)
+def test_own_liquidity(current_tick, expected_token0, expected_token1):
+    provider = make_provider(FakeArchive(tick=current_tick))
+    reads = PoolReads(provider, MINT_BLOCK)
+
+    async def calc():
+        position = await Position.fetch(provider, 1, MINT_BLOCK)
+        return await position.calc_own_liquidity(provider, reads)
+
+    own_liquidity = asyncio.run(calc())
+    assert own_liquidity.token0 == pytest.approx(expected_token0)
+    assert own_liquidity.token1 == pytest.approx(expected_token1)
@@ -0,0 +1,139 @@
+import asyncio
+import types
+
+import pytest
+
+from src.reports import PositionReport, TrackingReport, send_report
+
+NO_CHANGES = "No changes since the last report"
+
+
+def make_position(nft_token_id: int, fee_in_usd: float = 1.23) -> PositionReport:
+    return PositionReport(
+        nft_token_id=nft_token_id,
+        network="Arbitrum One L2",
+        token0_symbol="WETH",
+        token1_symbol="USDC",
+        price0=1234.5678912,
+        price1=0.00081,
+        liquidity0_amount=1.2,
+        liquidity1_amount=3.4,
+        liquidity_in_usd=5.6,
+        fee0_amount=0.001,
+        fee1_amount=0.002,
+        fee_in_usd=fee_in_usd,
+        total_usd=5.6 + fee_in_usd,
+    )
+
+
+def make_report(positions: int, fee_in_usd: float = 1.23) -> TrackingReport:
+    return TrackingReport(
+        positions=[make_position(i, fee_in_usd) for i in range(positions)],
+        total_fee_in_usd=fee_in_usd * positions,
+        total_locked_in_usd=5.6 * positions,
+        total_awaited_in_usd=(5.6 + fee_in_usd) * positions,
+        total_balance_in_usd=4.0,
+    )
+
+
+class FakeContext:
+    def __init__(self, from_id: int = 1, fail: bool = False):
+        self.msg = types.SimpleNamespace(from_id=from_id)
+        self.fail = fail
+        self.replies = []
+
+    async def reply(self, message: str, keyboard=None):
+        if self.fail:
+            raise ConnectionError
+        self.replies.append((message, keyboard))
+
+
+def test_position_render():
+    assert make_position(7).render() == (
+        "[ Arbitrum One L2 (7) ] "
+        "\n-> Pair: WETH/USDC"
+        "\n-> Price: 1234.5678912/0.0008100"
+        "\n-> Liquidity: 1.20000/3.40000"
+        "\n-> Fees: 0.00100/0.00200"
+        "\n-> $ Liquidity: $5.60"
+        "\n-> $ Fees: $1.23"
+        "\n-> $ Total: $6.83"
+        "\n"
+    )
+
+
+def test_render_without_positions():
+    report = make_report(0)
+    assert report.render() == (
+        "[ TOTAL ]"
+        "\n--> $ Fees: $0.00"
+        "\n--> $ Locked: $0.00"
+        "\n--> $ Awaited: $0.00"
+        "\n--> $ Balance: $4.00"
+        "\n--> $ Total: $4.00"
+    )
+    assert report.render_pages() == [report.render()]
+
+
+def test_pages_join_into_report():
+    report = make_report(100)
+    pages = report.render_pages()
+    assert len(pages) > 1
+    assert "\n\n".join(pages) == report.render()
+    assert all(len(page) <= 4096 for page in pages)
+
+
+@pytest.mark.parametrize("slack, first_page_positions", [(0, 2), (-1, 1)])
+def test_pages_at_limit(slack, first_page_positions):
+    report = make_report(3)
+    block = make_position(0).render()
+    # Two positions and the separator between them
+    limit = 2 * len(block) + 2 + slack
+
+    pages = report.render_pages(limit)
+    assert all(len(page) <= limit for page in pages)
+    assert pages[0] == "\n\n".join(
+        position.render() for position in report.positions[:first_page_positions]
+    )
+    assert "\n\n".join(pages) == report.render()
+
+
+def test_unchanged_report_is_not_sent():
+    ctx = FakeContext()
+    asyncio.run(send_report(ctx, make_report(2), "kb"))
+    assert ctx.replies == [(make_report(2).render(), "kb")]
+
+    # Changes below display precision are not visible
+    ctx.replies.clear()
+    asyncio.run(send_report(ctx, make_report(2, fee_in_usd=1.231), "kb"))
+    assert ctx.replies == [(NO_CHANGES, "kb")]
+
+    ctx.replies.clear()
+    asyncio.run(send_report(ctx, make_report(2, fee_in_usd=1.5), "kb"))
+    assert ctx.replies == [(make_report(2, fee_in_usd=1.5).render(), "kb")]
+
+
+def test_keyboard_goes_to_last_page():
+    ctx = FakeContext()
+    report = make_report(100)
+    asyncio.run(send_report(ctx, report, "kb"))
+    assert [message for message, _ in ctx.replies] == report.render_pages()
+    assert [keyboard for _, keyboard in ctx.replies] == [None] * (
+        len(ctx.replies) - 1
+    ) + ["kb"]
+
+
+def test_failed_report_is_sent_again():
+    with pytest.raises(ConnectionError):
+        asyncio.run(send_report(FakeContext(fail=True), make_report(1), "kb"))
+
+    ctx = FakeContext()
+    asyncio.run(send_report(ctx, make_report(1), "kb"))
+    assert ctx.replies == [(make_report(1).render(), "kb")]
+
+
+def test_snapshots_are_per_user():
+    asyncio.run(send_report(FakeContext(from_id=1), make_report(1), "kb"))
+    ctx = FakeContext(from_id=2)
+    asyncio.run(send_report(ctx, make_report(1), "kb"))
+    assert ctx.replies == [(make_report(1).render(), "kb")]